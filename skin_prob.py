@@ -1,10 +1,22 @@
-from urllib.request import Request, urlopen
-import os, time, json, random, re
+import os, time, re
+import hashlib
+import orjson
+import argparse
+import asyncio
+import aiohttp
+import ijson
+import numpy as np
+
+# === Random generator: PCG64, reseedable from the command line for reproducible runs ===
+rng = np.random.default_rng()
 
 # === Constants for URLs and file paths ===
 MAIN_SECTIONS_URL = "https://gate.skin.club/apiv2/main-sections"
 ODDS_URL = "https://gate.skin.club/apiv2/odds/"
-HEADERS = {'User-Agent': 'Mozilla/5.0'}  # Required to mimic a browser request
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0',  # Required to mimic a browser request
+    'Accept-Encoding': 'gzip, deflate'  # Compressed payloads; aiohttp decompresses transparently
+}
 CACHE_TIME_HOURS = 2  # How long to cache downloaded data before refreshing
 
 # === Constants for filtering specific test case and simulation ===
@@ -19,145 +31,248 @@ safe_section = re.sub(r'\W+', '_', TESTED_SECTION.lower())
 MAIN_SECTIONS_FILE = f"data/main_sections.json"
 ODDS_FILE = f"data/odds_{safe_case}.json"
 FILTERED_ODDS_FILE = f"data/filtered_odds_{safe_case}.json"
+ODDS_COLUMNS_FILE = f"data/odds_{safe_case}.npz"
 RESULTS_FILE = f"results/results_{safe_case}.txt"
+RESULTS_DROPS_FILE = f"results/results_{safe_case}.npz"
+
+# === Helper: decide whether a cached file is still fresh ===
+def cache_is_fresh(file):
+    meta_file = file + ".meta.json"
+    if os.path.exists(meta_file):
+        with open(meta_file, "rb") as f:
+            ts = orjson.loads(f.read()).get("ts")
+        if ts is not None:
+            return (time.time() - ts) / 3600 <= CACHE_TIME_HOURS
+    # No sidecar yet: fall back to the file's own mtime (fragile when tools reset mtimes)
+    return (time.time() - os.stat(file).st_mtime) / 3600 <= CACHE_TIME_HOURS
+
+# === Helper: request JSON data from a URL and save it to a file (revalidated with a conditional GET) ===
+async def request_json(session, url, file):
+    headers = {}
+    meta_file = file + ".meta.json"
+    meta = {}
+
+    # Send the validators from the last download so an unchanged payload comes back as a bodyless 304
+    if os.path.exists(file) and os.path.exists(meta_file):
+        with open(meta_file, "rb") as f:
+            meta = orjson.loads(f.read())
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    async with session.get(url, headers=headers) as response:
+        if response.status == 304:
+            # Cached copy is still current: extend its TTL without touching the body
+            meta["ts"] = time.time()
+            with open(meta_file, "wb") as f:
+                f.write(orjson.dumps(meta))
+            os.utime(file, None)
+            return
+        response.raise_for_status()
+        body = await response.read()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+    # Only rewrite the cache file when the content hash actually changed
+    body_sha1 = hashlib.sha1(body).hexdigest()
+    # Cache files are machine-consumed: compact output is 3-5x smaller and cheaper to write
+    if body_sha1 != meta.get("sha1"):
+        with open(file, "wb") as f:
+            f.write(body)
+    meta.update({"ts": time.time(), "etag": etag, "last_modified": last_modified, "sha1": body_sha1})
+    with open(meta_file, "wb") as f:
+        f.write(orjson.dumps(meta))
+
+# === Helper: O(1) weighted sampling via Walker's alias method (built with Vose's algorithm) ===
+class AliasSampler:
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        self.n = len(weights)
+        self.prob = np.ones(self.n)
+        self.alias = np.zeros(self.n, dtype=np.intp)
+
+        # Scale weights so the average bucket holds exactly probability 1
+        scaled = weights * (self.n / weights.sum())
+        small = [i for i in range(self.n) if scaled[i] < 1.0]
+        large = [i for i in range(self.n) if scaled[i] >= 1.0]
+
+        # Pair each under-full bucket with an over-full one until all are level
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+    def sample(self, k):
+        # Two uniform draws per sample: pick a bucket, then either keep it or take its alias
+        i = rng.integers(0, self.n, k)
+        r = rng.random(k)
+        return np.where(r < self.prob[i], i, self.alias[i])
 
-# === Helper: check how old a cached file is ===
-def check_file_mtime(file):
-    now = time.time()
-    file_mtime = os.stat(file).st_mtime
-    mtime_in_hours = (now - file_mtime) / 3600
-    return mtime_in_hours
-
-# === Helper: request JSON data from a URL and save it to a file ===
-def request_json(url, file):
-    req = Request(url, headers=HEADERS)
-    with urlopen(req) as response:
-        json_data = json.load(response)
-    with open(file, "w", encoding="utf-8") as f:
-        json.dump(json_data, f, indent=2)
+# === Optional: Numba-compiled inverse-CDF kernel, picked up automatically when numba is installed ===
+try:
+    from numba import njit
+
+    @njit(cache=True)
+    def simulate_compiled(cum_p, n, seed):
+        np.random.seed(seed)
+        last = len(cum_p) - 1
+        out = np.empty(n, dtype=np.int32)
+        for i in range(n):
+            out[i] = min(np.searchsorted(cum_p, np.random.random(), side="right"), last)
+        return out
+except ImportError:
+    simulate_compiled = None
 
 # === Main logic ===
-def main():
+async def main(simulate=False, dump_filtered=False):
     # Ensure results folder exists
     os.makedirs("results", exist_ok=True)
     os.makedirs("data", exist_ok=True)
 
-    # -- Step 1: Download or reuse cached main_sections file
-    if os.path.exists(MAIN_SECTIONS_FILE):
-        mtime_in_hours = check_file_mtime(MAIN_SECTIONS_FILE)
-        if mtime_in_hours > CACHE_TIME_HOURS:
-            request_json(MAIN_SECTIONS_URL, MAIN_SECTIONS_FILE)
-        else:
+    # The odds URL depends on the main_sections response, so the two requests are chained,
+    # but sharing one session lets the odds fetch reuse the TCP/TLS connection
+    async with aiohttp.ClientSession(headers=HEADERS) as session:
+        # -- Step 1: Download or reuse cached main_sections file
+        if os.path.exists(MAIN_SECTIONS_FILE) and cache_is_fresh(MAIN_SECTIONS_FILE):
             print(MAIN_SECTIONS_FILE, "has been updated within the last 2 hours, skipping request to skin.club API\n")
-    else:
-        request_json(MAIN_SECTIONS_URL, MAIN_SECTIONS_FILE)
-
-    # -- Step 2: Extract UID and case price for the specific test case
-    with open(MAIN_SECTIONS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    found_uid = None
-    for section in data.get("data"):
-        if section.get("name") == TESTED_SECTION:
-            for case in section.get("cases"):
-                if case.get("title") == TESTED_CASE:
-                    found_uid = case.get("last_successful_generation").get("uid")
-                    case_price = case.get("price")
-                    break
-
-    formatted_case_price = float(f"{case_price / 100:.2f}")
-
-    # -- Step 3: Build odds URL using the found UID
-    odds_url = f"{ODDS_URL}{found_uid}/contents"
-
-    # -- Step 4: Download or reuse cached odds file
-    if os.path.exists(ODDS_FILE):
-        mtime_in_hours = check_file_mtime(ODDS_FILE)
-        if mtime_in_hours > CACHE_TIME_HOURS:
-            request_json(odds_url, ODDS_FILE)
         else:
+            await request_json(session, MAIN_SECTIONS_URL, MAIN_SECTIONS_FILE)
+
+        # -- Step 2: Extract UID and case price for the specific test case
+        with open(MAIN_SECTIONS_FILE, "rb") as f:
+            data = orjson.loads(f.read())
+
+        found_uid = None
+        for section in data.get("data"):
+            if section.get("name") == TESTED_SECTION:
+                for case in section.get("cases"):
+                    if case.get("title") == TESTED_CASE:
+                        found_uid = case.get("last_successful_generation").get("uid")
+                        case_price = case.get("price")
+                        break
+
+        formatted_case_price = round(case_price / 100, 2)
+
+        # -- Step 3: Build odds URL using the found UID
+        odds_url = f"{ODDS_URL}{found_uid}/contents"
+
+        # -- Step 4: Download or reuse cached odds file
+        if os.path.exists(ODDS_FILE) and cache_is_fresh(ODDS_FILE):
             print(ODDS_FILE, "has been updated within the last 2 hours, skipping request to skin.club API\n")
+        else:
+            await request_json(session, odds_url, ODDS_FILE)
+
+    # -- Step 5: Load the parsed odds columns, reusing the binary sidecar when the odds body is unchanged
+    odds_sha1 = None
+    if os.path.exists(ODDS_FILE + ".meta.json"):
+        with open(ODDS_FILE + ".meta.json", "rb") as f:
+            odds_sha1 = orjson.loads(f.read()).get("sha1")
+
+    cached_columns = None
+    if odds_sha1 and os.path.exists(ODDS_COLUMNS_FILE):
+        loaded = np.load(ODDS_COLUMNS_FILE)
+        if str(loaded["sha1"]) == odds_sha1:
+            cached_columns = loaded
+
+    if cached_columns is not None:
+        items_array = cached_columns["names"]
+        prices = cached_columns["prices"]
+        chances = cached_columns["chances"]
     else:
-        request_json(odds_url, ODDS_FILE)
+        names_list = []
+        prices_list = []
+        chances_list = []
+        with open(ODDS_FILE, "rb") as f:
+            for item in ijson.items(f, "data.item"):
+                raw_name = item["item"]["market_hash_name"]
+                price = item["fixed_price"]
 
-    # -- Step 5: Parse and clean odds data
-    with open(ODDS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
+                # Strip special characters and emojis; most names are plain ASCII, so skip the
+                # encode/decode round trip (two allocations per item) whenever possible
+                if raw_name.isascii():
+                    clean_name = raw_name.strip()
+                else:
+                    clean_name = raw_name.encode("ascii", "ignore").decode().strip()
+                formatted_price = round(float(price) / 100, 2)  # float() because ijson yields Decimal for non-integer numbers
 
-    filtered_odds_json = {}
-    for item in data["data"]:
-        raw_name = item["item"]["market_hash_name"]
-        price = item["fixed_price"]
-        chance = float(item["chance_percent"])
+                names_list.append(clean_name)
+                prices_list.append(formatted_price)
+                chances_list.append(float(item["chance_percent"]))
 
-        # Strip special characters and emojis
-        clean_name = raw_name.encode("ascii", "ignore").decode().strip()
-        formatted_price = float(f"{price / 100:.2f}")
+        items_array = np.array(names_list)
+        prices = np.asarray(prices_list, dtype=np.float64)
+        chances = np.asarray(chances_list, dtype=np.float64)
 
-        filtered_odds_json[clean_name] = {
-            "price": formatted_price,
-            "chance": chance
-        }
+        # Persist the columns so the next run with an unchanged odds body skips the JSON parse
+        np.savez(ODDS_COLUMNS_FILE, names=items_array, prices=prices, chances=chances,
+                 sha1=np.array(odds_sha1 or ""))
 
-    # -- Step 6: Save cleaned odds to file
-    with open(FILTERED_ODDS_FILE, "w", encoding="utf-8") as f:
-        json.dump(filtered_odds_json, f, indent=2)
-
-    # -- Step 7: Prepare lists for simulation
-    items_list = []
-    chances_list = []
-    for item in filtered_odds_json:
-        items_list.append(item)
-        chances_list.append(filtered_odds_json[item]["chance"])
-
-    # -- Step 8: Run simulation and track profit
-    results_list = []
-    profitable_drops_list = []
-    for _ in range(TESTED_CASE_COUNT):
-        result = random.choices(items_list, weights=chances_list, k=1)[0]
-        results_list.append(result)
-        if filtered_odds_json[result]["price"] > formatted_case_price:
-            profitable_drops_list.append(result)
-
-    # -- Step 9: Save results
-    with open(RESULTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(results_list, f, indent=2)
-
-    profit = 0
-    for item in results_list:
-        profit += filtered_odds_json[item]["price"]
-    spendings = formatted_case_price * TESTED_CASE_COUNT
-
-    expected_return = 0
-    for item, data_entry in filtered_odds_json.items():
-        expected_return += (data_entry["chance"] / 100) * data_entry["price"]
+    # -- Step 6: Save cleaned odds to file when asked to (debugging aid, the arrays above are what gets used)
+    if dump_filtered:
+        filtered_odds_json = {name: {"price": price, "chance": chance}
+                              for name, price, chance in zip(items_array.tolist(), prices.tolist(), chances.tolist())}
+        with open(FILTERED_ODDS_FILE, "wb") as f:
+            f.write(orjson.dumps(filtered_odds_json, option=orjson.OPT_INDENT_2))
 
+    # -- Step 7: Expected value is a closed-form dot product, no sampling needed
+    # (divide the scalar afterwards instead of materializing a chances/100 temporary)
+    expected_return = float(chances @ prices) / 100
     expected_profit = expected_return - formatted_case_price
     return_ratio = (expected_return / formatted_case_price) * 100
 
     results_data = {
         "summary": {
-            "cases_opened": TESTED_CASE_COUNT,
             "case_name": TESTED_CASE,
             "case_price": formatted_case_price,
-            "total_spent": round(spendings, 2),
-            "total_earned": round(profit, 2),
-            "net_profit": round(profit - spendings, 2),
             "expected_return": round(expected_return, 2),
             "expected_profit": round(expected_profit, 2),
             "return_ratio_percent": round(return_ratio, 2)
-        },
-        "drops": results_list
+        }
     }
 
-    with open(RESULTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(results_data, f, indent=2)
+    # -- Step 8: Monte Carlo simulation on request (--simulate), for distribution analysis
+    if simulate:
+        if simulate_compiled is not None:
+            cum_p = np.cumsum(chances / chances.sum())
+            idx = simulate_compiled(cum_p, TESTED_CASE_COUNT, int(rng.integers(2**31)))
+        else:
+            idx = AliasSampler(chances).sample(TESTED_CASE_COUNT)
+        # Per-item histogram is all that matters downstream: O(n_items) memory instead of O(TESTED_CASE_COUNT)
+        counts = np.bincount(idx, minlength=len(items_array))
+
+        # All remaining reductions sweep counts/prices back to back while both are cache-resident
+        profit = float(counts @ prices)
+        profitable_drops_count = int(counts[prices > formatted_case_price].sum())
+        spendings = formatted_case_price * TESTED_CASE_COUNT
+
+        results_data["summary"].update({
+            "cases_opened": TESTED_CASE_COUNT,
+            "total_spent": round(spendings, 2),
+            "total_earned": round(profit, 2),
+            "net_profit": round(profit - spendings, 2),
+            "profitable_drops": profitable_drops_count
+        })
+
+        # Every drop as a uint16 index into names: an order of magnitude smaller than JSON strings,
+        # and the histogram is one np.bincount away for whoever loads it
+        np.savez_compressed(RESULTS_DROPS_FILE, drops=idx.astype(np.uint16), names=items_array)
+
+    with open(RESULTS_FILE, "wb") as f:
+        f.write(orjson.dumps(results_data, option=orjson.OPT_INDENT_2))
 
-    # -- Step 10: Print simulation results
-    print("You opened", TESTED_CASE_COUNT, TESTED_CASE, "cases.")
-    print("You spent", float(f"{spendings:.2f}"), "$")
-    print("You earned", float(f"{profit:.2f}"), "$\n")
-    print("Profits:", f"{profit - spendings:.2f}", "$\n")
+    # -- Step 9: Print simulation results
+    if simulate:
+        print("You opened", TESTED_CASE_COUNT, TESTED_CASE, "cases.")
+        print("You spent", round(spendings, 2), "$")
+        print("You earned", round(profit, 2), "$\n")
+        print("Profits:", f"{profit - spendings:.2f}", "$\n")
 
     print(f"\nExpected return per '{TESTED_CASE}' case: {expected_return:.2f} $")
     print(f"Expected profit per case: {expected_profit:.2f} $")
@@ -165,4 +280,13 @@ def main():
 
 # === Run the script ===
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Simulate opening skin.club cases and report the profitability")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random generator, for reproducible runs")
+    parser.add_argument("--simulate", action="store_true",
+                        help="run the Monte Carlo simulation on top of the analytic expected value")
+    parser.add_argument("--dump-filtered", action="store_true",
+                        help="also write the cleaned odds to FILTERED_ODDS_FILE for inspection")
+    args = parser.parse_args()
+    if args.seed is not None:
+        rng = np.random.default_rng(args.seed)
+    asyncio.run(main(simulate=args.simulate, dump_filtered=args.dump_filtered))